@@ -1,15 +1,29 @@
+import contextlib
+import gc
+import heapq
+import itertools
 import math
+import multiprocessing
+import threading
+from collections import deque
 
-from matplotlib.collections import LineCollection
+import numpy as np
 import time
 from FibHeap import FibonacciHeap
-import matplotlib.pyplot as plt
 from datetime import datetime
 from PriorityQueue import PriorityQueue
 
 WALK_SPEED = 5.0
 
 
+class InputFormatError(ValueError):
+    def __init__(self, path: str, line: int, message: str):
+        super().__init__(f'{path}, line {line}: {message}')
+        self.path = path
+        self.line = line
+        self.message = message
+
+
 class Node:
     def __init__(self, name: str, x: float, y: float, is_fake: bool):
         self.name = name
@@ -18,6 +32,7 @@ class Node:
         self.roads = []
         self.is_fake = is_fake
         self.fib_node = None
+        self.index = None
 
     def add_road(self, road):
         self.roads.append(road)
@@ -27,59 +42,225 @@ class Node:
 
 
 class Road:
-    def __init__(self, node1: Node, node2: Node, speed: float, is_fake: bool):
+    def __init__(self, node1: Node, node2: Node, speed: float, is_fake: bool, length=None, weight=None):
         self.node1 = node1
         self.node2 = node2
         self.speed = speed
-        self.length = euclidean_distance(node1.x, node1.y, node2.x, node2.y)
-        self.weight = self.length / speed
+        self.length = euclidean_distance(node1.x, node1.y, node2.x, node2.y) if length is None else length
+        self.weight = self.length / speed if weight is None else weight
         self.is_fake = is_fake
 
 
+# many concurrent readers or a single writer; waiting writers block new readers so a steady
+# stream of queries cannot starve speed updates
+class ReadWriteLock:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writers_waiting = 0
+        self._writing = False
+
+    def acquire_read(self):
+        with self._condition:
+            while self._writing or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._condition:
+            self._readers -= 1
+            if self._readers == 0:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        with self._condition:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+
+    def release_write(self):
+        with self._condition:
+            self._writing = False
+            self._condition.notify_all()
+
+
 class Graph:
-    def __init__(self, map_path: str):
+    ORDER_FILE = 0
+    ORDER_HILBERT = 1
+    ORDER_BFS = 2
+
+    MAX_CHANGE_LOG = 1024
+
+    def __init__(self, map_path: str, ordering=ORDER_FILE):
         self.nodes = []
         self.roads = []
+        self.ordering = ordering
+        self.version = 0
+        self.lock = ReadWriteLock()
+        self._roads_by_ends = None
+        self._change_log = deque(maxlen=self.MAX_CHANGE_LOG)
+        self._change_log_lock = threading.Lock()
+        # latest (node1 name, node2 name, speed) per updated road, replayed on copies of this graph
+        self.speed_overrides = {}
         self._read_map(map_path)
 
     def _read_map(self, path: str):
-        nodes = []
-        roads = []
+        names, xs, ys, ends1, ends2, speeds = read_map_arrays(path)
+        if self.ordering != self.ORDER_FILE:
+            names, xs, ys, ends1, ends2, speeds = self._renumber(names, xs, ys, ends1, ends2, speeds)
+
+        lengths = np.sqrt((xs[ends1] - xs[ends2]) ** 2 + (ys[ends2] - ys[ends1]) ** 2)
+        weights = lengths / speeds
+
+        # none of the hundreds of thousands of node and road objects built here is garbage,
+        # so the cyclic collector is paused instead of rescanning them over and over
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
         try:
-            with open(path, 'r') as file:
-                nodes_count = 0
-                for i, line in enumerate(file):
-                    line = line.strip()
-                    if i == 0:
-                        nodes_count = int(line)
-                        continue
-                    elif i == nodes_count + 1:
-                        continue
-                    elif i <= nodes_count:
-                        parts = line.split(' ')
-                        name = parts[0]
-                        x = float(parts[1])
-                        y = float(parts[2])
-                        nodes.append(Node(name, x, y, False))
-                    elif i > nodes_count + 1:
-                        parts = line.split(' ')
-                        node1 = nodes[int(parts[0])]
-                        node2 = nodes[int(parts[1])]
-                        speed = float(parts[2])
-                        road = Road(node1, node2, speed, False)
-                        node1.add_road(road)
-                        node2.add_road(road)
-                        roads.append(road)
-
-        except FileNotFoundError:
-            print("File not found. Please provide a valid file path.")
-        except Exception as e:
-            print("An error occurred:", e)
+            nodes = [Node(name, x, y, False) for name, x, y in zip(names, xs.tolist(), ys.tolist())]
+            for index, node in enumerate(nodes):
+                node.index = index
+            roads = []
+            for end1, end2, speed, length, weight in zip(ends1.tolist(), ends2.tolist(), speeds.tolist(),
+                                                         lengths.tolist(), weights.tolist()):
+                node1 = nodes[end1]
+                node2 = nodes[end2]
+                road = Road(node1, node2, speed, False, length, weight)
+                node1.add_road(road)
+                node2.add_road(road)
+                roads.append(road)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
 
         self.nodes = nodes
         self.roads = roads
 
+    # permutes node ids so that intersections close on the map get close ids (and are allocated
+    # next to each other), roads are then sorted by their lower endpoint; names are kept as read
+    def _renumber(self, names: list, xs, ys, ends1, ends2, speeds):
+        if self.ordering == self.ORDER_HILBERT:
+            order = self._hilbert_order(xs, ys)
+        elif self.ordering == self.ORDER_BFS:
+            order = self._bfs_order(len(names), ends1, ends2, self._hilbert_order(xs, ys))
+        else:
+            raise ValueError(f'Unknown node ordering: {self.ordering}')
+
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        ends1 = rank[ends1]
+        ends2 = rank[ends2]
+        road_order = np.argsort(np.minimum(ends1, ends2), kind='stable')
+        names = [names[index] for index in order.tolist()]
+        return names, xs[order], ys[order], ends1[road_order], ends2[road_order], speeds[road_order]
+
+    @staticmethod
+    def _hilbert_order(xs, ys, bits=16):
+        side = 1 << bits
+        if len(xs) == 0:
+            return np.empty(0, dtype=np.int64)
+        span = max(xs.max() - xs.min(), ys.max() - ys.min()) or 1.0
+        x = ((xs - xs.min()) / span * (side - 1)).astype(np.int64)
+        y = ((ys - ys.min()) / span * (side - 1)).astype(np.int64)
+        distance = np.zeros(len(xs), dtype=np.int64)
+        s = side >> 1
+        while s > 0:
+            rx = ((x & s) > 0).astype(np.int64)
+            ry = ((y & s) > 0).astype(np.int64)
+            distance += s * s * ((3 * rx) ^ ry)
+            flip = (ry == 0) & (rx == 1)
+            x = np.where(flip, side - 1 - x, x)
+            y = np.where(flip, side - 1 - y, y)
+            swap = ry == 0
+            x, y = np.where(swap, y, x), np.where(swap, x, y)
+            s >>= 1
+        return np.argsort(distance, kind='stable')
+
+    # breadth first order over the road network, each component is started from its
+    # first node along the given seed order
+    @staticmethod
+    def _bfs_order(count: int, ends1, ends2, seeds):
+        heads = np.concatenate([ends1, ends2])
+        tails = np.concatenate([ends2, ends1])
+        edge_order = np.argsort(heads, kind='stable')
+        offsets = np.searchsorted(heads[edge_order], np.arange(count + 1)).tolist()
+        neighbors = tails[edge_order].tolist()
+
+        visited = [False] * count
+        order = []
+        for seed in seeds.tolist():
+            if visited[seed]:
+                continue
+            visited[seed] = True
+            queue = deque([seed])
+            while queue:
+                current = queue.popleft()
+                order.append(current)
+                for neighbor in neighbors[offsets[current]:offsets[current + 1]]:
+                    if not visited[neighbor]:
+                        visited[neighbor] = True
+                        queue.append(neighbor)
+        return np.array(order, dtype=np.int64)
+
+    # applies (node1 name, node2 name, new speed) updates in place, only the weights of the
+    # matching roads are recomputed; the whole batch becomes one new graph version
+    def update_speeds(self, updates: list):
+        self.lock.acquire_write()
+        try:
+            if self._roads_by_ends is None:
+                self._roads_by_ends = {}
+                for road in self.roads:
+                    if not road.is_fake:
+                        self._roads_by_ends.setdefault(_ends_key(road.node1.name, road.node2.name), []).append(road)
+
+            changes = []
+            for name1, name2, speed in updates:
+                roads = self._roads_by_ends.get(_ends_key(str(name1), str(name2)))
+                if roads is None:
+                    raise KeyError(f'No road between nodes {name1} and {name2}')
+                if not speed > 0 or math.isinf(speed):
+                    raise ValueError(f'Speed must be a positive number, got {speed}')
+                changes.append((roads, speed))
+
+            for name1, name2, speed in updates:
+                self.speed_overrides[_ends_key(str(name1), str(name2))] = (str(name1), str(name2), speed)
+
+            changed_roads = []
+            for roads, speed in changes:
+                for road in roads:
+                    road.speed = speed
+                    road.weight = road.length / speed
+                    changed_roads.append(road)
+            with self._change_log_lock:
+                self.version += 1
+                self._change_log.append((self.version, changed_roads))
+            return self.version
+        finally:
+            self.lock.release_write()
+
+    # roads changed after the given version, or None once the log no longer reaches back that far
+    # and dependent caches have to be rebuilt from scratch; safe to call while updates are applied
+    def changes_since(self, version: int):
+        with self._change_log_lock:
+            if version == self.version:
+                return set()
+            if not self._change_log or self._change_log[0][0] > version + 1:
+                return None
+            return {road for change_version, roads in self._change_log if change_version > version
+                    for road in roads}
+
+    @contextlib.contextmanager
+    def read_snapshot(self):
+        self.lock.acquire_read()
+        try:
+            yield self
+        finally:
+            self.lock.release_read()
+
     def add_node(self, node: Node):
+        node.index = len(self.nodes)
         self.nodes.append(node)
 
     def add_road(self, road: Road):
@@ -95,32 +276,162 @@ class Query:
         self.dst_y = dst_y
         self.r = r
         self.file_name = None
+        self.src_candidates = None
+        self.dst_candidates = None
 
     def set_file_name(self, file_name):
         self.file_name = file_name
 
+    def set_candidates(self, src_candidates, dst_candidates):
+        self.src_candidates = src_candidates
+        self.dst_candidates = dst_candidates
+
+    @staticmethod
+    def to_arrays(queries: list):
+        src_x = np.array([query.src_x for query in queries], dtype=float)
+        src_y = np.array([query.src_y for query in queries], dtype=float)
+        dst_x = np.array([query.dst_x for query in queries], dtype=float)
+        dst_y = np.array([query.dst_y for query in queries], dtype=float)
+        r = np.array([query.r for query in queries], dtype=float)
+        return src_x, src_y, dst_x, dst_y, r
+
     @staticmethod
     def read_queries(queries_path: str):
-        queries = []
-        try:
-            with open(queries_path, 'r') as file:
-                for i, line in enumerate(file):
-                    line = line.strip()
-                    if i == 0:
-                        continue
-                    parts = line.split(' ')
-                    src_x = float(parts[0])
-                    src_y = float(parts[1])
-                    dst_x = float(parts[2])
-                    dst_y = float(parts[3])
-                    r = float(parts[4])
-                    queries.append(Query(i, src_x, src_y, dst_x, dst_y, r))
-        except FileNotFoundError:
-            print("File not found. Please provide a valid file path.")
-        except Exception as e:
-            print("An error occurred:", e)
-
-        return queries
+        lines = _read_lines(queries_path)
+        queries_count = _parse_count(queries_path, lines, 0)
+        tokens = _split_block(queries_path, lines, 1, queries_count, 5)
+        if len(lines) > queries_count + 1:
+            raise InputFormatError(queries_path, queries_count + 2, 'unexpected data after the query block')
+        columns = [_parse_column(queries_path, 1, tokens, 5, column, np.float64) for column in range(5)]
+        _check_rows(queries_path, 1, ~np.isfinite(np.vstack(columns)).all(axis=0), 'values must be finite numbers')
+        _check_rows(queries_path, 1, columns[4] < 0, 'radius must not be negative')
+
+        return [Query(i + 1, src_x, src_y, dst_x, dst_y, r)
+                for i, (src_x, src_y, dst_x, dst_y, r) in enumerate(zip(*(column.tolist() for column in columns)))]
+
+
+class CancellationToken:
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, limit: str):
+        super().__init__(f'Search budget exceeded: {limit}')
+        self.limit = limit
+
+
+# per-query limits checked cooperatively by the candidate scan and the search loops,
+# start() resets the counters so one budget can be reused for consecutive queries; max_seconds
+# counts from the start of Navigator.navigate/evaluate and so includes the map load, which
+# cannot be interrupted itself, the query stops at the first check after it
+class SearchBudget:
+    LIMIT_TIME = 'time'
+    LIMIT_SETTLED = 'settled nodes'
+    LIMIT_CANDIDATES = 'candidates'
+    LIMIT_CANCELLED = 'cancelled'
+
+    CLOCK_CHECK_INTERVAL = 256
+
+    def __init__(self, max_seconds=None, max_settled=None, max_candidates=None, token=None):
+        self.max_seconds = max_seconds
+        self.max_settled = max_settled
+        self.max_candidates = max_candidates
+        self.token = token
+        self.started_at = None
+        self.settled = 0
+        self.candidates = 0
+
+    def start(self):
+        self.started_at = time.time()
+        self.settled = 0
+        self.candidates = 0
+
+    def check(self):
+        if self.token is not None and self.token.cancelled:
+            raise BudgetExceeded(self.LIMIT_CANCELLED)
+        if self.max_seconds is not None and time.time() - self.started_at > self.max_seconds:
+            raise BudgetExceeded(self.LIMIT_TIME)
+
+    def add_candidates(self, count: int):
+        self.candidates += count
+        if self.max_candidates is not None and self.candidates > self.max_candidates:
+            raise BudgetExceeded(self.LIMIT_CANDIDATES)
+
+    def settle(self):
+        self.settled += 1
+        if self.max_settled is not None and self.settled > self.max_settled:
+            raise BudgetExceeded(self.LIMIT_SETTLED)
+        if self.settled % self.CLOCK_CHECK_INTERVAL == 0:
+            self.check()
+
+    def stats(self, limit=None):
+        return {
+            'limit': limit,
+            'elapsed': time.time() - self.started_at,
+            'settled': self.settled,
+            'candidates': self.candidates,
+        }
+
+
+# uniform grid over the real intersections of a graph, nodes are stored sorted by cell so every
+# row of cells overlapping a search circle is one contiguous slice of the coordinate arrays
+class SpatialGrid:
+    def __init__(self, graph: Graph, cell_size=0.1):
+        real_nodes = [node for node in graph.nodes if not node.is_fake]
+        xs = np.array([node.x for node in real_nodes], dtype=float)
+        ys = np.array([node.y for node in real_nodes], dtype=float)
+        indices = np.array([node.index for node in real_nodes], dtype=np.int64)
+
+        self.cell_size = cell_size
+        self.min_x = float(xs.min()) if len(xs) else 0.0
+        self.min_y = float(ys.min()) if len(ys) else 0.0
+        self.cols = int((xs.max() - self.min_x) // cell_size) + 1 if len(xs) else 1
+        self.rows = int((ys.max() - self.min_y) // cell_size) + 1 if len(ys) else 1
+
+        cells = ((ys - self.min_y) // cell_size).astype(np.int64) * self.cols + \
+            ((xs - self.min_x) // cell_size).astype(np.int64)
+        order = np.argsort(cells, kind='stable')
+        self.xs = xs[order]
+        self.ys = ys[order]
+        self.indices = indices[order]
+        self.cell_starts = np.searchsorted(cells[order], np.arange(self.rows * self.cols + 1))
+
+    # indices of the nodes within r of (x, y), in graph order
+    def query(self, x: float, y: float, r: float):
+        col_lo = max(self._cell(x - r - self.min_x, self.cols), 0)
+        col_hi = min(self._cell(x + r - self.min_x, self.cols), self.cols - 1)
+        row_lo = max(self._cell(y - r - self.min_y, self.rows), 0)
+        row_hi = min(self._cell(y + r - self.min_y, self.rows), self.rows - 1)
+        if col_lo > col_hi or row_lo > row_hi:
+            return np.empty(0, dtype=np.int64)
+
+        row_cells = np.arange(row_lo, row_hi + 1) * self.cols
+        starts = self.cell_starts[row_cells + col_lo]
+        lengths = self.cell_starts[row_cells + col_hi + 1] - starts
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.arange(lengths.sum()) + np.repeat(starts - offsets, lengths)
+
+        dx = self.xs[positions]
+        dx -= x
+        dx *= dx
+        dy = self.ys[positions]
+        dy -= y
+        dy *= dy
+        dx += dy
+        inside = np.sqrt(dx, out=dx) <= r
+        return np.sort(self.indices[positions[inside]])
+
+    # cell coordinate of an offset from the grid origin, clamped to one cell beyond either edge
+    # before flooring so that huge radii cannot overflow
+    def _cell(self, offset: float, count: int):
+        return math.floor(min(max(offset, -self.cell_size), count * self.cell_size) / self.cell_size)
+
+    def query_batch(self, xs, ys, rs):
+        return [self.query(x, y, r) for x, y, r in zip(xs.tolist(), ys.tolist(), rs.tolist())]
 
 
 class Result:
@@ -129,6 +440,7 @@ class Result:
     REASON_END_NODE_NOT_FOUND = 2
     REASON_START_END_NODES_NOT_FOUND = 3
     REASON_NO_PATH = 4
+    REASON_BUDGET_EXCEEDED = 5
 
     def __init__(self, graph: Graph, query: Query, nodes: list, duration: float, reason: int):
         self.graph = graph
@@ -137,26 +449,65 @@ class Result:
         self.duration = duration
         self.exec_time = None
         self.reason = reason
+        self.stats = None
+        self.dropped_candidates = None
+
+    # the failure reason when no intersection is close enough to the start or the end, None otherwise
+    @staticmethod
+    def missing_candidates_reason(src_candidates, dst_candidates):
+        if src_candidates and dst_candidates:
+            return None
+        if not src_candidates and not dst_candidates:
+            return Result.REASON_START_END_NODES_NOT_FOUND
+        if not src_candidates:
+            return Result.REASON_START_NODE_NOT_FOUND
+        return Result.REASON_END_NODE_NOT_FOUND
 
     def set_exec_time(self, exec_time: float):
         self.exec_time = exec_time
 
+    def set_stats(self, stats: dict):
+        self.stats = stats
+
+    def set_dropped_candidates(self, src_dropped: int, dst_dropped: int):
+        self.dropped_candidates = (src_dropped, dst_dropped)
+
     def get_path_length(self):
         walking_length = 0
         vehicle_length = 0
         path_step = len(self.nodes)
         for i in range(path_step - 1):
-            node = self.nodes[i]
-            next_node = self.nodes[i + 1]
-            for road in node.roads:
-                if road.node1 == next_node or road.node2 == next_node:
-                    if i == 0 or i == path_step - 2:
-                        walking_length += road.length
-                    else:
-                        vehicle_length += road.length
-                    break
+            road = self._road_between(self.nodes[i], self.nodes[i + 1])
+            if road is None:
+                continue
+            if i == 0 or i == path_step - 2:
+                walking_length += road.length
+            else:
+                vehicle_length += road.length
         return walking_length, vehicle_length
 
+    # the walking road to the end node may only be attached to the end node itself
+    # when the route was computed on a shared graph that must not be modified
+    @staticmethod
+    def _road_between(node: Node, next_node: Node):
+        for road in itertools.chain(node.roads, next_node.roads):
+            if (road.node1 == node and road.node2 == next_node) or (road.node1 == next_node and road.node2 == node):
+                return road
+        return None
+
+    def to_dict(self):
+        walking_length, vehicle_length = self.get_path_length() if self.nodes else (0, 0)
+        return {
+            'id': self.query.id,
+            'reason': self.reason,
+            'duration': self.duration if self.reason == self.REASON_SUCCESS else None,
+            'path': [node.name for node in self.nodes],
+            'walking_length': walking_length,
+            'vehicle_length': vehicle_length,
+            'exec_time': self.exec_time,
+            'stats': self.stats,
+        }
+
     def __str__(self):
         if self.reason == self.REASON_START_END_NODES_NOT_FOUND:
             return (f'Query #{self.query.id}\n'
@@ -170,6 +521,12 @@ class Result:
         elif self.reason == self.REASON_NO_PATH:
             return (f'Query #{self.query.id}\n'
                     f'No solution for Query {self.query.id} because there is no path between starting and ending nodes')
+        elif self.reason == self.REASON_BUDGET_EXCEEDED:
+            return (f'Query #{self.query.id}\n'
+                    f'No solution for Query {self.query.id} because the search budget was exceeded '
+                    f'({self.stats["limit"]})\n'
+                    f'Settled nodes: {self.stats["settled"]}, candidates: {self.stats["candidates"]}\n'
+                    f'Total execution time = {self.exec_time} s')
         else:
             nodes = [node.name for node in self.nodes]
             walking_length, vehicle_length = self.get_path_length()
@@ -179,9 +536,15 @@ class Result:
                     f'Distance from source to destination: {walking_length + vehicle_length}\n'
                     f'       Walking distance from source to destination: {walking_length} km\n'
                     f'       Vehicle distance from source to destination: {vehicle_length} km\n'
-                    f'Total execution time = {self.exec_time} s')
+                    + (f'Dropped candidates (source, destination): {self.dropped_candidates}\n'
+                       if self.dropped_candidates is not None else '')
+                    + f'Total execution time = {self.exec_time} s')
 
     def generate_map(self, saving_path: str, plot_all_nodes: bool):
+        # imported here so that console runs and worker processes that never plot skip matplotlib
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import LineCollection
+
         fig, ax = plt.subplots(figsize=(8, 8))
 
         if plot_all_nodes:
@@ -231,39 +594,166 @@ class Result:
         plt.close()
 
 
+class DistanceMatrix:
+    def __init__(self, graph: Graph, origins: list, destinations: list, durations, exits, predecessors):
+        self.graph = graph
+        self.origins = origins
+        self.destinations = destinations
+        self.durations = durations
+        self.exits = exits
+        self.predecessors = predecessors
+
+    def path(self, i: int, j: int):
+        if self.predecessors is None:
+            raise ValueError('Predecessors were not requested for this matrix')
+        index = int(self.exits[i, j])
+        path = []
+        if index < 0:
+            return path
+        nodes, previous = self.predecessors[i]
+        while index >= 0:
+            path.append(self.graph.nodes[index])
+            index = int(previous[np.searchsorted(nodes, index)])
+        return list(reversed(path))
+
+
+class Isochrone:
+    def __init__(self, graph: Graph, x: float, y: float, r: float, max_duration: float, arrivals: dict):
+        self.graph = graph
+        self.x = x
+        self.y = y
+        self.r = r
+        self.max_duration = max_duration
+        self.arrivals = arrivals
+
+    def node_names(self):
+        return [node.name for node in self.arrivals]
+
+    # boolean grid of cells reachable within the budget, either by walking straight from the
+    # origin or by walking the time left over after arriving at a reached intersection; like
+    # routing, no walk is longer than r
+    def raster(self, cell_size: float):
+        reach = [(self.x, self.y, min(self.r, self.max_duration * WALK_SPEED))]
+        reach.extend((node.x, node.y, min(self.r, (self.max_duration - arrival) * WALK_SPEED))
+                     for node, arrival in self.arrivals.items())
+        min_x = min(x - radius for x, _, radius in reach)
+        min_y = min(y - radius for _, y, radius in reach)
+        max_x = max(x + radius for x, _, radius in reach)
+        max_y = max(y + radius for _, y, radius in reach)
+        cols = int(math.ceil((max_x - min_x) / cell_size)) + 1
+        rows = int(math.ceil((max_y - min_y) / cell_size)) + 1
+        grid = np.zeros((rows, cols), dtype=bool)
+
+        for x, y, radius in reach:
+            col_lo = int((x - radius - min_x) / cell_size)
+            col_hi = int((x + radius - min_x) / cell_size) + 1
+            row_lo = int((y - radius - min_y) / cell_size)
+            row_hi = int((y + radius - min_y) / cell_size) + 1
+            centers_x = min_x + (np.arange(col_lo, col_hi) + 0.5) * cell_size
+            centers_y = min_y + (np.arange(row_lo, row_hi) + 0.5) * cell_size
+            inside = (centers_y[:, None] - y) ** 2 + (centers_x[None, :] - x) ** 2 <= radius ** 2
+            grid[row_lo:row_hi, col_lo:col_hi] |= inside
+
+        return grid, (min_x, min_y, cell_size)
+
+
+# drops candidate intersections that can be reached more cheaply by walking to another candidate
+# and driving from there, which never changes the optimal duration; K_NEAREST additionally keeps
+# only the k survivors closest to the point and is therefore approximate
+class CandidatePruning:
+    MODE_NONE = 0
+    MODE_EXACT = 1
+    MODE_K_NEAREST = 2
+
+    def __init__(self, mode=MODE_EXACT, k=None):
+        if mode == self.MODE_K_NEAREST and not k:
+            raise ValueError('k must be given for k-nearest candidate pruning')
+        self.mode = mode
+        self.k = k
+
+    def select(self, x: float, y: float, candidates: list):
+        if self.mode == self.MODE_NONE or not candidates:
+            return candidates, 0
+
+        walking = {node: euclidean_distance(x, y, node.x, node.y) / WALK_SPEED for node in candidates}
+        label = dict(walking)
+        heap = [(walk, node.index, node) for node, walk in walking.items()]
+        heapq.heapify(heap)
+        while heap:
+            current_distance, _, current_node = heapq.heappop(heap)
+            if current_distance > label[current_node]:
+                continue
+            for road in current_node.roads:
+                if road.is_fake:
+                    continue
+                neighbor = road.node1 if road.node2 == current_node else road.node2
+                if neighbor in label and current_distance + road.weight < label[neighbor]:
+                    label[neighbor] = current_distance + road.weight
+                    heapq.heappush(heap, (label[neighbor], neighbor.index, neighbor))
+
+        kept = [node for node in candidates if walking[node] <= label[node]]
+        if self.mode == self.MODE_K_NEAREST:
+            kept = sorted(kept, key=lambda node: walking[node])[:self.k]
+        return kept, len(candidates) - len(kept)
+
+
 class Navigator:
-    def __init__(self, map_file_path: str):
+    def __init__(self, map_file_path: str, pruning=None, ordering=Graph.ORDER_FILE):
         self.map_file_path = map_file_path
-
-    def navigate(self, query: Query, need_generate_map=False, saving_map_path=None, plot_all_nodes=True):
-        graph = Graph(self.map_file_path)
-        result = self._process_query(graph, query)
+        self.pruning = pruning
+        self.ordering = ordering
+
+    def _load_graph(self):
+        return Graph(self.map_file_path, self.ordering)
+
+    def navigate(self, query: Query, need_generate_map=False, saving_map_path=None, plot_all_nodes=True,
+                 budget=None):
+        # the map load counts against the wall time limit of the budget
+        if budget is not None:
+            budget.start()
+        graph = self._load_graph()
+        result = self._process_query(graph, query, budget, budget is not None)
         if need_generate_map:
             result.generate_map(saving_map_path, plot_all_nodes)
         return result
 
-    def _process_query(self, graph: Graph, query: Query):
+    def _process_query(self, graph: Graph, query: Query, budget=None, budget_started=False):
+        return self._run_within_budget(graph, query, budget, lambda: self._route_query(graph, query, budget),
+                                       budget_started)
+
+    @staticmethod
+    def _run_within_budget(graph: Graph, query: Query, budget, route, budget_started=False):
         start_tic = time.time()
-        src_candidates, dst_candidates = self._find_candidate_intersections(graph, query)
-        if not src_candidates or not dst_candidates:
-            if not src_candidates and not dst_candidates:
-                reason = Result.REASON_START_END_NODES_NOT_FOUND
-            elif not src_candidates:
-                reason = Result.REASON_START_NODE_NOT_FOUND
-            else:
-                reason = Result.REASON_END_NODE_NOT_FOUND
+        if budget is not None and not budget_started:
+            budget.start()
+        try:
+            result = route()
+        except BudgetExceeded as e:
+            result = Result(graph, query, [], 0, Result.REASON_BUDGET_EXCEEDED)
+            result.set_stats(budget.stats(e.limit))
+        else:
+            if budget is not None:
+                result.set_stats(budget.stats())
+        end_tic = time.time()
+        result.set_exec_time(end_tic - start_tic)
+        return result
 
-            result = Result(graph, query, [], 0, reason)
-            end_tick = time.time()
-            result.set_exec_time(end_tick - start_tic)
-            return result
+    def _route_query(self, graph: Graph, query: Query, budget=None):
+        src_candidates, dst_candidates = self._find_candidate_intersections(graph, query, budget)
+        reason = Result.missing_candidates_reason(src_candidates, dst_candidates)
+        if reason is not None:
+            return Result(graph, query, [], 0, reason)
+        src_dropped = dst_dropped = 0
+        if self.pruning is not None:
+            src_candidates, src_dropped = self.pruning.select(query.src_x, query.src_y, src_candidates)
+            dst_candidates, dst_dropped = self.pruning.select(query.dst_x, query.dst_y, dst_candidates)
         src = self._add_node(graph, 'S', query.src_x, query.src_y, src_candidates)
         dst = self._add_node(graph, 'E', query.dst_x, query.dst_y, dst_candidates)
-        path, total_time = self._dijkstra(graph, src, dst)
+        path, total_time = self._dijkstra(graph, src, dst, budget)
         reason = Result.REASON_SUCCESS if path else Result.REASON_NO_PATH
         result = Result(graph, query, path, total_time, reason)
-        end_tic = time.time()
-        result.set_exec_time(end_tic - start_tic)
+        if self.pruning is not None:
+            result.set_dropped_candidates(src_dropped, dst_dropped)
         return result
 
     @staticmethod
@@ -279,10 +769,20 @@ class Navigator:
         return node
 
     @staticmethod
-    def _find_candidate_intersections(graph: Graph, query: Query):
+    def _find_candidate_intersections(graph: Graph, query: Query, budget=None):
+        if query.src_candidates is not None and query.dst_candidates is not None:
+            src_candidates = [graph.nodes[index] for index in query.src_candidates.tolist()]
+            dst_candidates = [graph.nodes[index] for index in query.dst_candidates.tolist()]
+            if budget is not None:
+                budget.check()
+                budget.add_candidates(len(src_candidates) + len(dst_candidates))
+            return src_candidates, dst_candidates
+
         src_candidates = []
         dst_candidates = []
-        for node in graph.nodes:
+        for i, node in enumerate(graph.nodes):
+            if budget is not None and i % SearchBudget.CLOCK_CHECK_INTERVAL == 0:
+                budget.check()
             dist = euclidean_distance(node.x, node.y, query.src_x, query.src_y)
             if dist <= query.r:
                 src_candidates.append(node)
@@ -291,10 +791,210 @@ class Navigator:
             if dist <= query.r:
                 dst_candidates.append(node)
 
+        if budget is not None:
+            budget.add_candidates(len(src_candidates) + len(dst_candidates))
         return src_candidates, dst_candidates
 
+    # snaps every source and destination of a query file in one pass over a spatial grid,
+    # navigate and evaluate then reuse the stored candidates instead of scanning all nodes
+    def snap_queries(self, queries: list, graph=None):
+        if graph is None:
+            graph = self._load_graph()
+        grid = SpatialGrid(graph)
+        src_x, src_y, dst_x, dst_y, r = Query.to_arrays(queries)
+        src_candidates = grid.query_batch(src_x, src_y, r)
+        dst_candidates = grid.query_batch(dst_x, dst_y, r)
+        for query, src, dst in zip(queries, src_candidates, dst_candidates):
+            query.set_candidates(src, dst)
+
+    # walking time from a point to each of its candidate intersections, the same
+    # weight a fake road created by _add_node would carry
+    @staticmethod
+    def _walking_times(x: float, y: float, candidates: list):
+        return {node: euclidean_distance(x, y, node.x, node.y) / WALK_SPEED for node in candidates}
+
+    # heap based search from several weighted sources, stops as soon as every target is settled
+    # or, when max_duration is given, once nothing else can be reached within that budget
+    @staticmethod
+    def _one_to_many(sources: dict, targets=None, max_duration=math.inf, budget=None):
+        distance = {node: cost for node, cost in sources.items() if cost <= max_duration}
+        previous = {}
+        heap = [(cost, node.index, node) for node, cost in distance.items()]
+        heapq.heapify(heap)
+        remaining = set(targets) if targets is not None else None
+
+        while heap and (remaining is None or remaining):
+            current_distance, _, current_node = heapq.heappop(heap)
+            if current_distance > distance[current_node]:
+                continue
+            if budget is not None:
+                budget.settle()
+            if remaining is not None:
+                remaining.discard(current_node)
+
+            for road in current_node.roads:
+                if road.is_fake:
+                    continue
+                neighbor = road.node1 if road.node2 == current_node else road.node2
+                alt_distance = current_distance + road.weight
+                if alt_distance <= max_duration and alt_distance < distance.get(neighbor, math.inf):
+                    distance[neighbor] = alt_distance
+                    previous[neighbor] = current_node
+                    heapq.heappush(heap, (alt_distance, neighbor.index, neighbor))
+
+        return distance, previous
+
+    # point to point search seeded with the walking times to the source candidates, it stops once
+    # no unsettled node can improve on the best destination candidate plus its walk
     @staticmethod
-    def _dijkstra(graph: Graph, start_node: Node, end_node: Node):
+    def _seeded_dijkstra(sources: dict, exits: dict, budget=None):
+        distance = dict(sources)
+        previous = {}
+        heap = [(cost, node.index, node) for node, cost in sources.items()]
+        heapq.heapify(heap)
+        best = math.inf
+        best_exit = None
+
+        while heap:
+            current_distance, _, current_node = heapq.heappop(heap)
+            if current_distance > distance[current_node]:
+                continue
+            if current_distance >= best:
+                break
+            if budget is not None:
+                budget.settle()
+            if current_node in exits and current_distance + exits[current_node] < best:
+                best = current_distance + exits[current_node]
+                best_exit = current_node
+
+            for road in current_node.roads:
+                if road.is_fake:
+                    continue
+                neighbor = road.node1 if road.node2 == current_node else road.node2
+                alt_distance = current_distance + road.weight
+                if alt_distance < distance.get(neighbor, math.inf):
+                    distance[neighbor] = alt_distance
+                    previous[neighbor] = current_node
+                    heapq.heappush(heap, (alt_distance, neighbor.index, neighbor))
+
+        if best_exit is None:
+            return [], None
+        path = [best_exit]
+        while path[-1] in previous:
+            path.append(previous[path[-1]])
+        return list(reversed(path)), best
+
+    @staticmethod
+    def _matrix_row(graph: Graph, src_snap: list, dst_snaps: list, targets: set, return_predecessors: bool):
+        row = np.full(len(dst_snaps), np.inf)
+        exits = np.full(len(dst_snaps), -1, dtype=np.int32) if return_predecessors else None
+        predecessors = None
+        if not src_snap:
+            return row, exits, predecessors
+
+        sources = {graph.nodes[index]: walk for index, walk in src_snap}
+        distance, previous = Navigator._one_to_many(sources, {graph.nodes[index] for index in targets})
+        for j, dst_snap in enumerate(dst_snaps):
+            for index, walk in dst_snap:
+                total_time = distance.get(graph.nodes[index], math.inf) + walk
+                if total_time < row[j]:
+                    row[j] = total_time
+                    if return_predecessors:
+                        exits[j] = index
+
+        # only the branches of the search tree that lead to a destination are kept,
+        # as (node indices, previous node indices) sorted by node index
+        if return_predecessors:
+            tree = {}
+            for index in exits.tolist():
+                node = graph.nodes[index] if index >= 0 else None
+                while node is not None and node.index not in tree:
+                    previous_node = previous.get(node)
+                    tree[node.index] = previous_node.index if previous_node is not None else -1
+                    node = previous_node
+            nodes = np.array(sorted(tree), dtype=np.int32)
+            predecessors = (nodes, np.array([tree[index] for index in nodes.tolist()], dtype=np.int32))
+        return row, exits, predecessors
+
+    def matrix(self, origins: list, destinations: list, r: float, return_predecessors=False, chunk_size=64,
+               workers=1):
+        return self._matrix(self._load_graph(), origins, destinations, r, return_predecessors, chunk_size, workers)
+
+    def _matrix(self, graph: Graph, origins: list, destinations: list, r: float, return_predecessors: bool,
+                chunk_size: int, workers: int):
+        src_snaps = self._snap_points(graph, origins, r)
+        dst_snaps = self._snap_points(graph, destinations, r)
+        targets = {index for dst_snap in dst_snaps for index, _ in dst_snap}
+
+        chunks = [src_snaps[i:i + chunk_size] for i in range(0, len(src_snaps), chunk_size)]
+        if workers > 1:
+            state = {'dst_snaps': dst_snaps, 'targets': targets, 'return_predecessors': return_predecessors}
+            with multiprocessing.Pool(workers, initializer=_init_worker,
+                                      initargs=(self.map_file_path, self.ordering,
+                                                list(graph.speed_overrides.values()), state)) as pool:
+                rows = [row for chunk_rows in pool.imap(_run_matrix_chunk, chunks) for row in chunk_rows]
+        else:
+            rows = [self._matrix_row(graph, src_snap, dst_snaps, targets, return_predecessors)
+                    for chunk in chunks for src_snap in chunk]
+
+        durations = np.full((len(origins), len(destinations)), np.inf)
+        exits = np.full((len(origins), len(destinations)), -1, dtype=np.int32) if return_predecessors else None
+        predecessors = [None] * len(origins) if return_predecessors else None
+        for i, (row, row_exits, row_predecessors) in enumerate(rows):
+            durations[i] = row
+            if return_predecessors and row_predecessors is not None:
+                exits[i] = row_exits
+                predecessors[i] = row_predecessors
+
+        return DistanceMatrix(graph, origins, destinations, durations, exits, predecessors)
+
+    @staticmethod
+    def _isochrone_arrivals(graph: Graph, src_snap: list, max_duration: float):
+        sources = {graph.nodes[index]: walk for index, walk in src_snap}
+        distance, _ = Navigator._one_to_many(sources, max_duration=max_duration)
+        return {node.index: arrival for node, arrival in distance.items()}
+
+    def isochrone(self, x: float, y: float, r: float, max_duration: float):
+        return self.isochrones([(x, y)], r, max_duration)[0]
+
+    def isochrones(self, points: list, r: float, max_duration: float, chunk_size=64, workers=1):
+        return self._isochrones(self._load_graph(), points, r, max_duration, chunk_size, workers)
+
+    def _isochrones(self, graph: Graph, points: list, r: float, max_duration: float, chunk_size: int, workers: int):
+        src_snaps = self._snap_points(graph, points, r)
+
+        chunks = [src_snaps[i:i + chunk_size] for i in range(0, len(src_snaps), chunk_size)]
+        if workers > 1:
+            state = {'max_duration': max_duration}
+            with multiprocessing.Pool(workers, initializer=_init_worker,
+                                      initargs=(self.map_file_path, self.ordering,
+                                                list(graph.speed_overrides.values()), state)) as pool:
+                arrivals = [item for chunk_arrivals in pool.imap(_run_isochrone_chunk, chunks)
+                            for item in chunk_arrivals]
+        else:
+            arrivals = [self._isochrone_arrivals(graph, src_snap, max_duration)
+                        for chunk in chunks for src_snap in chunk]
+
+        return [Isochrone(graph, x, y, r, max_duration,
+                          {graph.nodes[index]: arrival for index, arrival in item.items()})
+                for (x, y), item in zip(points, arrivals)]
+
+    # candidates are passed around as (node index, walking time) pairs so they can be shipped to worker processes
+    def _snap_points(self, graph: Graph, points: list, r: float):
+        grid = SpatialGrid(graph)
+        xs = np.array([x for x, _ in points], dtype=float)
+        ys = np.array([y for _, y in points], dtype=float)
+        indices = grid.query_batch(xs, ys, np.full(len(points), r))
+        return [self._snap(graph, x, y, point_indices) for (x, y), point_indices in zip(points, indices)]
+
+    def _snap(self, graph: Graph, x: float, y: float, indices):
+        candidates = [graph.nodes[index] for index in indices.tolist()]
+        if self.pruning is not None:
+            candidates, _ = self.pruning.select(x, y, candidates)
+        return [(node.index, walk) for node, walk in Navigator._walking_times(x, y, candidates).items()]
+
+    @staticmethod
+    def _dijkstra(graph: Graph, start_node: Node, end_node: Node, budget=None):
         distance = {node: float('inf') for node in graph.nodes}
         distance[start_node] = 0
         previous = {node: None for node in graph.nodes}
@@ -305,9 +1005,13 @@ class Navigator:
                 node.add_fib_node(fib_heap.insert(0, node))
             else:
                 node.add_fib_node(fib_heap.insert(math.inf, node))
+        if budget is not None:
+            budget.check()
 
         while fib_heap.total_nodes != 0:
             current_node = fib_heap.extract_min().value
+            if budget is not None:
+                budget.settle()
 
             if current_node == end_node:
                 path = []
@@ -328,43 +1032,44 @@ class Navigator:
 
         return [], None
 
-    def evaluate(self, query: Query, use_fake_nodes: bool, use_fib: bool):
-        graph = Graph(self.map_file_path)
-        start_tic = time.time()
-        src_candidates, dst_candidates = self._find_candidate_intersections(graph, query)
-        if not src_candidates or not dst_candidates:
-            if not src_candidates and not dst_candidates:
-                reason = Result.REASON_START_END_NODES_NOT_FOUND
-            elif not src_candidates:
-                reason = Result.REASON_START_NODE_NOT_FOUND
-            else:
-                reason = Result.REASON_END_NODE_NOT_FOUND
-
-            result = Result(graph, query, [], 0, reason)
-            end_tick = time.time()
-            result.set_exec_time(end_tick - start_tic)
-            return result
+    def evaluate(self, query: Query, use_fake_nodes: bool, use_fib: bool, budget=None):
+        if budget is not None:
+            budget.start()
+        graph = self._load_graph()
+        return self._run_within_budget(graph, query, budget,
+                                       lambda: self._evaluate_query(graph, query, use_fake_nodes, use_fib, budget),
+                                       budget is not None)
+
+    def _evaluate_query(self, graph: Graph, query: Query, use_fake_nodes: bool, use_fib: bool, budget=None):
+        src_candidates, dst_candidates = self._find_candidate_intersections(graph, query, budget)
+        reason = Result.missing_candidates_reason(src_candidates, dst_candidates)
+        if reason is not None:
+            return Result(graph, query, [], 0, reason)
+        src_dropped = dst_dropped = 0
+        if self.pruning is not None:
+            src_candidates, src_dropped = self.pruning.select(query.src_x, query.src_y, src_candidates)
+            dst_candidates, dst_dropped = self.pruning.select(query.dst_x, query.dst_y, dst_candidates)
 
         if use_fake_nodes:
             src = self._add_node(graph, 'S', query.src_x, query.src_y, src_candidates)
             dst = self._add_node(graph, 'E', query.dst_x, query.dst_y, dst_candidates)
             if use_fib:
-                path, total_time = self._dijkstra(graph, src, dst)
+                path, total_time = self._dijkstra(graph, src, dst, budget)
             else:
-                path, total_time = self._naive_dijkstra(graph, src, dst)
+                path, total_time = self._naive_dijkstra(graph, src, dst, budget)
             reason = Result.REASON_SUCCESS if path else Result.REASON_NO_PATH
-            result = Result(graph, query, path, total_time, reason)
-            end_tic = time.time()
-            result.set_exec_time(end_tic - start_tic)
-            return result
+            best_result = Result(graph, query, path, total_time, reason)
+            if self.pruning is not None:
+                best_result.set_dropped_candidates(src_dropped, dst_dropped)
+            return best_result
 
         best_result = Result(graph, query, [], math.inf, Result.REASON_NO_PATH)
         for src in src_candidates:
             for dst in dst_candidates:
                 if use_fib:
-                    path, total_time = self._dijkstra(graph, src, dst)
+                    path, total_time = self._dijkstra(graph, src, dst, budget)
                 else:
-                    path, total_time = self._naive_dijkstra(graph, src, dst)
+                    path, total_time = self._naive_dijkstra(graph, src, dst, budget)
 
                 if path:
                     total_time += euclidean_distance(query.src_x, query.src_y, src.x, src.y) / WALK_SPEED
@@ -373,12 +1078,11 @@ class Navigator:
                     if total_time < best_result.duration:
                         best_result = Result(graph, query, path, total_time, Result.REASON_SUCCESS)
 
-        end_tic = time.time()
-        best_result.set_exec_time(end_tic - start_tic)
-
+        if self.pruning is not None:
+            best_result.set_dropped_candidates(src_dropped, dst_dropped)
         return best_result
 
-    def _naive_dijkstra(self, graph: Graph, start_node: Node, end_node: Node):
+    def _naive_dijkstra(self, graph: Graph, start_node: Node, end_node: Node, budget=None):
         distance = {node: float('inf') for node in graph.nodes}
         distance[start_node] = 0
         previous = {node: None for node in graph.nodes}
@@ -388,9 +1092,13 @@ class Navigator:
                 pq.insert(0, node)
             else:
                 pq.insert(math.inf, node)
+        if budget is not None:
+            budget.check()
 
         while not pq.is_empty():
             d, current_node = pq.extract_min()
+            if budget is not None:
+                budget.settle()
 
             if current_node == end_node:
                 path = []
@@ -412,5 +1120,275 @@ class Navigator:
         return [], None
 
 
+# keeps one graph resident for many queries and accepts speed updates between them; each query
+# runs against a read snapshot and never adds its start and end nodes to the shared graph
+class LiveNavigator(Navigator):
+    def __init__(self, map_file_path: str, pruning=None, ordering=Graph.ORDER_FILE):
+        super().__init__(map_file_path, pruning, ordering)
+        self.graph = Graph(map_file_path, ordering)
+        self.grid = SpatialGrid(self.graph)
+
+    # a private copy of the map carrying the live speeds, for the inherited paths that add
+    # their start and end nodes to the graph they run on
+    def _load_graph(self):
+        with self.graph.read_snapshot() as graph:
+            speed_updates = list(graph.speed_overrides.values())
+        copy = Graph(self.map_file_path, self.ordering)
+        if speed_updates:
+            copy.update_speeds(speed_updates)
+        return copy
+
+    @property
+    def version(self):
+        return self.graph.version
+
+    def update_speeds(self, updates: list):
+        return self.graph.update_speeds(updates)
+
+    def snap_queries(self, queries: list, graph=None):
+        super().snap_queries(queries, self.graph)
+
+    # the one to many searches never modify the graph so they run on the resident one
+    def matrix(self, origins: list, destinations: list, r: float, return_predecessors=False, chunk_size=64,
+               workers=1):
+        with self.graph.read_snapshot() as graph:
+            return self._matrix(graph, origins, destinations, r, return_predecessors, chunk_size, workers)
+
+    def isochrones(self, points: list, r: float, max_duration: float, chunk_size=64, workers=1):
+        with self.graph.read_snapshot() as graph:
+            return self._isochrones(graph, points, r, max_duration, chunk_size, workers)
+
+    def navigate(self, query: Query, need_generate_map=False, saving_map_path=None, plot_all_nodes=True,
+                 budget=None):
+        with self.graph.read_snapshot() as graph:
+            result = self._run_within_budget(graph, query, budget, lambda: self._route_live(graph, query, budget))
+        if need_generate_map:
+            result.generate_map(saving_map_path, plot_all_nodes)
+        return result
+
+    def _route_live(self, graph: Graph, query: Query, budget=None):
+        reason, sources, exits, dropped = self._live_seeds(graph, query, budget)
+        if reason != Result.REASON_SUCCESS:
+            return Result(graph, query, [], 0, reason)
+
+        path, total_time = self._seeded_dijkstra(sources, exits, budget)
+        if not path:
+            return Result(graph, query, [], None, Result.REASON_NO_PATH)
+
+        result = self._path_result(graph, query, path, total_time)
+        if self.pruning is not None:
+            result.set_dropped_candidates(*dropped)
+        return result
+
+    # up to k routes, shortest first, built from one forward tree grown from the source walks and
+    # one backward tree grown from the destination walks, both bounded by (1 + max_stretch) times
+    # the shortest duration; every node reached by both trees is a via node whose route is its
+    # forward branch followed by its backward branch, a route is kept when it has no loop and
+    # at most max_overlap of its driving time is spent on roads of an already kept route
+    def alternatives(self, query: Query, k=3, max_overlap=0.7, max_stretch=0.3, budget=None):
+        with self.graph.read_snapshot() as graph:
+            start_tic = time.time()
+            if budget is not None:
+                budget.start()
+            try:
+                results = self._route_alternatives(graph, query, k, max_overlap, max_stretch, budget)
+            except BudgetExceeded as e:
+                results = [Result(graph, query, [], 0, Result.REASON_BUDGET_EXCEEDED)]
+                results[0].set_stats(budget.stats(e.limit))
+            else:
+                if budget is not None:
+                    for result in results:
+                        result.set_stats(budget.stats())
+            end_tic = time.time()
+        for result in results:
+            result.set_exec_time(end_tic - start_tic)
+        return results
+
+    def _route_alternatives(self, graph: Graph, query: Query, k: int, max_overlap: float, max_stretch: float,
+                            budget=None):
+        reason, sources, exits, _ = self._live_seeds(graph, query, budget)
+        if reason != Result.REASON_SUCCESS:
+            return [Result(graph, query, [], 0, reason)]
+
+        path, best = self._seeded_dijkstra(sources, exits, budget)
+        if not path:
+            return [Result(graph, query, [], None, Result.REASON_NO_PATH)]
+        if k <= 1:
+            return [self._path_result(graph, query, path, best)]
+
+        limit = best * (1 + max_stretch)
+        forward, forward_previous = self._one_to_many(sources, max_duration=limit, budget=budget)
+        backward, backward_next = self._one_to_many(exits, max_duration=limit, budget=budget)
+        # nodes along a road used by both trees share one route, only the first node of such a plateau is
+        # tried, and nodes whose backward branch turns straight back along their forward branch are skipped
+        vias = sorted((duration + backward[node], node.index, node) for node, duration in forward.items()
+                      if node in backward and duration + backward[node] <= limit
+                      and (node not in forward_previous
+                           or (backward_next.get(forward_previous[node]) is not node
+                               and backward_next.get(node) is not forward_previous[node])))
+
+        routes = []
+        examined = set()
+        for duration, _, via in vias:
+            if len(routes) == k:
+                break
+            # a via node lying on an examined route would mostly repeat that route
+            if via in examined:
+                continue
+            head = [via]
+            while head[-1] in forward_previous:
+                head.append(forward_previous[head[-1]])
+            tail = [via]
+            while tail[-1] in backward_next:
+                tail.append(backward_next[tail[-1]])
+            # a looping route is the route of the node where its branches meet, which comes up on its own
+            if len(set(head) | set(tail)) != len(head) + len(tail) - 1:
+                continue
+            examined.update(head)
+            examined.update(tail)
+
+            roads = {}
+            for node, previous_node in zip(head, head[1:]):
+                roads[_ends_key(previous_node.name, node.name)] = forward[node] - forward[previous_node]
+            for node, next_node in zip(tail, tail[1:]):
+                roads[_ends_key(node.name, next_node.name)] = backward[node] - backward[next_node]
+            road_time = sum(roads.values())
+            if any(sum(weight for key, weight in roads.items() if key in kept_roads) > max_overlap * road_time
+                   for _, _, kept_roads in routes):
+                continue
+            routes.append((list(reversed(head)) + tail[1:], duration, roads))
+
+        return [self._path_result(graph, query, path, duration) for path, duration, _ in routes]
+
+    def _live_seeds(self, graph: Graph, query: Query, budget=None):
+        if query.src_candidates is None or query.dst_candidates is None:
+            src_x, src_y, dst_x, dst_y, r = Query.to_arrays([query])
+            query.set_candidates(self.grid.query(src_x[0], src_y[0], r[0]),
+                                 self.grid.query(dst_x[0], dst_y[0], r[0]))
+        src_candidates, dst_candidates = self._find_candidate_intersections(graph, query, budget)
+        reason = Result.missing_candidates_reason(src_candidates, dst_candidates)
+        if reason is not None:
+            return reason, None, None, (0, 0)
+
+        src_dropped = dst_dropped = 0
+        if self.pruning is not None:
+            src_candidates, src_dropped = self.pruning.select(query.src_x, query.src_y, src_candidates)
+            dst_candidates, dst_dropped = self.pruning.select(query.dst_x, query.dst_y, dst_candidates)
+        sources = self._walking_times(query.src_x, query.src_y, src_candidates)
+        exits = self._walking_times(query.dst_x, query.dst_y, dst_candidates)
+        return Result.REASON_SUCCESS, sources, exits, (src_dropped, dst_dropped)
+
+    # the walks to and from the path go through detached S and E nodes so the resident graph is untouched
+    @staticmethod
+    def _path_result(graph: Graph, query: Query, path: list, total_time: float):
+        src = Node('S', query.src_x, query.src_y, True)
+        src.add_road(Road(src, path[0], WALK_SPEED, True))
+        dst = Node('E', query.dst_x, query.dst_y, True)
+        dst.add_road(Road(path[-1], dst, WALK_SPEED, True))
+        return Result(graph, query, [src] + path + [dst], total_time, Result.REASON_SUCCESS)
+
+
+def _ends_key(name1: str, name2: str):
+    return (name1, name2) if name1 <= name2 else (name2, name1)
+
+
+# parses and validates a map file into plain arrays: node names, coordinates, road endpoints and speeds
+def read_map_arrays(path: str):
+    lines = _read_lines(path)
+    nodes_count = _parse_count(path, lines, 0)
+    node_tokens = _split_block(path, lines, 1, nodes_count, 3)
+    xs = _parse_column(path, 1, node_tokens, 3, 1, np.float64)
+    ys = _parse_column(path, 1, node_tokens, 3, 2, np.float64)
+    _check_rows(path, 1, ~(np.isfinite(xs) & np.isfinite(ys)), 'coordinates must be finite numbers')
+
+    roads_start = nodes_count + 2
+    roads_count = _parse_count(path, lines, nodes_count + 1)
+    road_tokens = _split_block(path, lines, roads_start, roads_count, 3)
+    if len(lines) > roads_start + roads_count:
+        raise InputFormatError(path, roads_start + roads_count + 1, 'unexpected data after the road block')
+    ends1 = _parse_column(path, roads_start, road_tokens, 3, 0, np.int64)
+    ends2 = _parse_column(path, roads_start, road_tokens, 3, 1, np.int64)
+    speeds = _parse_column(path, roads_start, road_tokens, 3, 2, np.float64)
+    _check_rows(path, roads_start, (ends1 < 0) | (ends1 >= nodes_count) | (ends2 < 0) | (ends2 >= nodes_count),
+                f'node index out of range [0, {nodes_count})')
+    _check_rows(path, roads_start, ~(np.isfinite(speeds) & (speeds > 0)), 'speed must be a positive number')
+
+    return node_tokens[0::3], xs, ys, ends1, ends2, speeds
+
+
+def _read_lines(path: str):
+    with open(path, 'r') as file:
+        lines = file.read().splitlines()
+    while lines and not lines[-1].strip():
+        lines.pop()
+    return lines
+
+
+def _parse_count(path: str, lines: list, index: int):
+    if index >= len(lines):
+        raise InputFormatError(path, index + 1, 'missing count line')
+    try:
+        count = int(lines[index])
+    except ValueError:
+        raise InputFormatError(path, index + 1, f'expected a count, got {lines[index]!r}') from None
+    if count < 0:
+        raise InputFormatError(path, index + 1, f'count must not be negative, got {count}')
+    return count
+
+
+# joins a block of rows into one token list after checking the field count of every row,
+# so errors in two rows that cancel out in the total cannot shift the columns
+def _split_block(path: str, lines: list, start: int, count: int, columns: int):
+    block = lines[start:start + count]
+    if len(block) < count:
+        raise InputFormatError(path, start + len(block) + 1, f'expected {count} rows, found {len(block)}')
+    fields = np.fromiter(map(len, map(str.split, block)), dtype=np.int64, count=len(block))
+    invalid = np.flatnonzero(fields != columns)
+    if len(invalid):
+        row = int(invalid[0])
+        raise InputFormatError(path, start + row + 1, f'expected {columns} fields, got {block[row]!r}')
+    return ' '.join(block).split()
+
+
+def _parse_column(path: str, start: int, tokens: list, columns: int, column: int, dtype):
+    values = tokens[column::columns]
+    try:
+        return np.array(values, dtype=dtype)
+    except ValueError:
+        for i, value in enumerate(values):
+            try:
+                dtype(value)
+            except ValueError:
+                raise InputFormatError(path, start + i + 1, f'invalid value {value!r}') from None
+        raise
+
+
+def _check_rows(path: str, start: int, invalid, message: str):
+    rows = np.flatnonzero(invalid)
+    if len(rows):
+        raise InputFormatError(path, start + int(rows[0]) + 1, message)
+
+
+_worker = {}
+
+
+def _init_worker(map_file_path: str, ordering: int, speed_updates: list, state: dict):
+    _worker['graph'] = Graph(map_file_path, ordering)
+    if speed_updates:
+        _worker['graph'].update_speeds(speed_updates)
+    _worker.update(state)
+
+
+def _run_matrix_chunk(src_snaps: list):
+    return [Navigator._matrix_row(_worker['graph'], src_snap, _worker['dst_snaps'], _worker['targets'],
+                                  _worker['return_predecessors'])
+            for src_snap in src_snaps]
+
+
+def _run_isochrone_chunk(src_snaps: list):
+    return [Navigator._isochrone_arrivals(_worker['graph'], src_snap, _worker['max_duration'])
+            for src_snap in src_snaps]
+
+
 def euclidean_distance(x1, y1, x2, y2):
     return math.sqrt(pow(x1 - x2, 2) + pow(y2 - y1, 2))
@@ -12,12 +12,13 @@ from kivy.uix.gridlayout import GridLayout
 from kivy.core.window import Window
 from tqdm import tqdm
 
-from Entities import Query, Navigator, Result
+from Entities import Query, Navigator, Result, SearchBudget, InputFormatError
 
 INPUT_ROOT = './input'
 OUTPUT_PATH = './output'
 NEED_GENERATE_MAP = True
 PLOT_ALL_NODES = True
+MAX_QUERY_SECONDS = 30
 
 
 class FileSelectionPopup(Popup):
@@ -160,7 +161,13 @@ class NavigatorApplication(App):
         self.queries_button.disabled = False
 
     def _on_queries_selected(self, path):
-        self.queries = Query.read_queries(path)
+        try:
+            self.queries = Query.read_queries(path)
+            self.navigator.snap_queries(self.queries)
+        except (OSError, InputFormatError) as e:
+            self.queries = None
+            self.result_summary.text = f'Could not load input files: {e}'
+            return
         self.execute_all_button.disabled = len(self.queries) == 0
         self.queries_button.text = self._get_file_name(path)
         self.queries_button.disabled = True
@@ -175,8 +182,9 @@ class NavigatorApplication(App):
     def _on_execute_all(self):
         solved_queries = 0
         count = len(self.queries)
+        budget = SearchBudget(max_seconds=MAX_QUERY_SECONDS)
         for query in tqdm(self.queries):
-            result = self.navigator.navigate(query, NEED_GENERATE_MAP, OUTPUT_PATH, PLOT_ALL_NODES)
+            result = self.navigator.navigate(query, NEED_GENERATE_MAP, OUTPUT_PATH, PLOT_ALL_NODES, budget)
             if result.reason == Result.REASON_SUCCESS:
                 solved_queries += 1
             print(result)
@@ -0,0 +1,326 @@
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from Entities import LiveNavigator, Query, SearchBudget
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+QUERY_FIELDS = ('src_x', 'src_y', 'dst_x', 'dst_y', 'r')
+MAX_HEADERS = 64
+MAX_BODY_BYTES = 1024 * 1024
+
+_worker = {}
+
+
+def _init_worker(map_path: str, max_query_seconds):
+    _worker['navigator'] = LiveNavigator(map_path)
+    _worker['max_query_seconds'] = max_query_seconds
+
+
+def _route_batch(batch: list):
+    navigator = _worker['navigator']
+    results = []
+    for query_id, fields in batch:
+        query = Query(query_id, *fields)
+        budget = SearchBudget(max_seconds=_worker['max_query_seconds']) \
+            if _worker['max_query_seconds'] is not None else None
+        # a failing query must not fail the unrelated queries batched with it
+        try:
+            results.append(navigator.navigate(query, budget=budget).to_dict())
+        except Exception as e:
+            results.append(RuntimeError(f'{type(e).__name__}: {e}'))
+    return results
+
+
+class BadRequest(Exception):
+    def __init__(self, message: str, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# headless HTTP/JSON front end for a resident graph; searches run in a process pool, identical
+# in-flight queries share one search, queued queries are shipped to workers in small batches
+# and requests beyond max_pending queries are refused with 503 instead of queueing without bound
+class RoutingService:
+    def __init__(self, map_path: str, workers=1, max_pending=256, max_batch=16, batch_window=0.002,
+                 max_query_seconds=30):
+        self.map_path = map_path
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.max_query_seconds = max_query_seconds
+        self.pool = None
+        self.queue = None
+        self.in_flight = {}
+        self.pending = 0
+        self.next_id = 0
+        self.counters = {'requests': 0, 'queries': 0, 'coalesced': 0, 'rejected': 0, 'batches': 0}
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                        initargs=(self.map_path, self.max_query_seconds))
+        # load the graph in every worker before accepting connections
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _route_batch, []) for _ in range(self.workers)))
+        self.queue = asyncio.Queue()
+        dispatchers = [asyncio.ensure_future(self._dispatch()) for _ in range(self.workers)]
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        print(f'Routing service listening on http://{host}:{port} with {self.workers} worker(s)')
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for dispatcher in dispatchers:
+                dispatcher.cancel()
+            self.pool.shutdown(cancel_futures=True)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except BadRequest as e:
+                    self._write_response(writer, e.status, {'error': str(e)}, False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                status, payload = await self._handle_request(method, path, body)
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # malformed or oversized requests raise BadRequest, the connection is answered and closed since
+    # the stream can no longer be trusted to be at a request boundary
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return None
+            parts = request_line.decode('latin-1').split()
+            if len(parts) != 3:
+                raise BadRequest('Malformed request line')
+            method, path, _ = parts
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                if len(headers) == MAX_HEADERS:
+                    raise BadRequest(f'More than {MAX_HEADERS} headers', 431)
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+        except ValueError:
+            # StreamReader.readline raises ValueError for lines beyond its buffer limit
+            raise BadRequest('Request line or header too long', 431) from None
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise BadRequest('Invalid Content-Length') from None
+        if length < 0:
+            raise BadRequest('Invalid Content-Length')
+        if length > MAX_BODY_BYTES:
+            raise BadRequest(f'Request body larger than {MAX_BODY_BYTES} bytes', 413)
+        body = await reader.readexactly(length) if length else b''
+        return method, path, headers, body
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool):
+        reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+                   431: 'Request Header Fields Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+        body = json.dumps(payload).encode()
+        headers = [f'HTTP/1.1 {status} {reasons.get(status, "")}', 'Content-Type: application/json',
+                   f'Content-Length: {len(body)}', f'Connection: {"keep-alive" if keep_alive else "close"}']
+        if status == 503:
+            headers.append('Retry-After: 1')
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode() + body)
+
+    async def _handle_request(self, method: str, path: str, body: bytes):
+        self.counters['requests'] += 1
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok', 'pending': self.pending, **self.counters}
+        if method != 'POST' or path not in ('/route', '/batch'):
+            return 404, {'error': f'Unknown endpoint {method} {path}'}
+
+        try:
+            document = json.loads(body or b'null')
+            items = document.get('queries') if path == '/batch' and isinstance(document, dict) else [document]
+            if not isinstance(items, list):
+                raise BadRequest('Batch requests need a "queries" list')
+            queries = [self._parse_query(item) for item in items]
+        except (ValueError, BadRequest) as e:
+            return 400, {'error': str(e)}
+
+        if self.pending + len(queries) > self.max_pending:
+            self.counters['rejected'] += 1
+            return 503, {'error': 'Too many pending queries, retry later'}
+
+        try:
+            results = await asyncio.gather(*(self._submit(query_id, fields) for query_id, fields in queries))
+        except Exception as e:
+            return 500, {'error': f'Routing failed: {e}'}
+        return 200, results[0] if path == '/route' else {'results': results}
+
+    def _parse_query(self, item):
+        if not isinstance(item, dict):
+            raise BadRequest('A query must be a JSON object')
+        try:
+            fields = tuple(float(item[name]) for name in QUERY_FIELDS)
+        except KeyError as e:
+            raise BadRequest(f'Missing query field {e.args[0]}') from None
+        except (TypeError, ValueError):
+            raise BadRequest('Query fields must be numbers') from None
+        if not all(math.isfinite(value) for value in fields) or fields[4] < 0:
+            raise BadRequest('Query fields must be finite and r must not be negative')
+        self.next_id += 1
+        return item.get('id', self.next_id), fields
+
+    async def _submit(self, query_id, fields: tuple):
+        self.counters['queries'] += 1
+        future = self.in_flight.get(fields)
+        if future is not None:
+            self.counters['coalesced'] += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self.in_flight[fields] = future
+            self.pending += 1
+            await self.queue.put((fields, future))
+        result = dict(await asyncio.shield(future))
+        result['id'] = query_id
+        return result
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.counters['batches'] += 1
+            try:
+                results = await loop.run_in_executor(self.pool, _route_batch,
+                                                     [(0, fields) for fields, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            for (fields, future), result in zip(batch, results):
+                self.in_flight.pop(fields, None)
+                self.pending -= 1
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+async def _send_route(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str, query: Query):
+    body = json.dumps({name: getattr(query, name) for name in QUERY_FIELDS} | {'id': query.id}).encode()
+    writer.write(f'POST /route HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+
+# keeps a fixed number of keep-alive connections busy for the given duration and
+# reports the sustained throughput and latency percentiles of successful requests
+async def generate_load(query_path: str, host=DEFAULT_HOST, port=DEFAULT_PORT, connections=8, duration=30.0,
+                        seed=0):
+    queries = Query.read_queries(query_path)
+    rng = random.Random(seed)
+    latencies = []
+    statuses = {}
+    stop_at = time.perf_counter() + duration
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while time.perf_counter() < stop_at:
+                query = rng.choice(queries)
+                start_tic = time.perf_counter()
+                status = await _send_route(reader, writer, host, query)
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(time.perf_counter() - start_tic)
+                else:
+                    await asyncio.sleep(0.05)
+        finally:
+            writer.close()
+
+    start_tic = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    elapsed = time.perf_counter() - start_tic
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] if latencies else math.nan
+
+    report = {'requests': sum(statuses.values()), 'statuses': statuses, 'elapsed': elapsed,
+              'qps': len(latencies) / elapsed, 'p50': percentile(50), 'p90': percentile(90),
+              'p99': percentile(99), 'max': latencies[-1] if latencies else math.nan}
+    print(f'{report["requests"]} requests in {elapsed:.1f} s over {connections} connections, statuses {statuses}')
+    print(f'Sustained QPS: {report["qps"]:.2f}')
+    print(f'Latency p50 = {report["p50"]:.3f} s, p90 = {report["p90"]:.3f} s, p99 = {report["p99"]:.3f} s, '
+          f'max = {report["max"]:.3f} s')
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local routing service and load generator')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='serve routing requests over HTTP/JSON')
+    serve_parser.add_argument('--map', default='./input/Map200k.txt')
+    serve_parser.add_argument('--host', default=DEFAULT_HOST)
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument('--workers', type=int, default=1)
+    serve_parser.add_argument('--max-pending', type=int, default=256)
+    serve_parser.add_argument('--max-query-seconds', type=float, default=30)
+
+    load_parser = subparsers.add_parser('load', help='measure sustained QPS and latency of a running service')
+    load_parser.add_argument('--queries', default='./input/Query_200k_1000.txt')
+    load_parser.add_argument('--host', default=DEFAULT_HOST)
+    load_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    load_parser.add_argument('--connections', type=int, default=8)
+    load_parser.add_argument('--duration', type=float, default=30.0)
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        service = RoutingService(args.map, args.workers, args.max_pending,
+                                 max_query_seconds=args.max_query_seconds)
+        asyncio.run(service.serve(args.host, args.port))
+    else:
+        asyncio.run(generate_load(args.queries, args.host, args.port, args.connections, args.duration))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+import heapq
+import math
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from Entities import Navigator, Node, Road, Result, WALK_SPEED, euclidean_distance, read_map_arrays
+
+META_FILE = 'meta.npz'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _tile_file(tiles_path: str, tile_id: int):
+    return os.path.join(tiles_path, f'tile_{tile_id}.npz')
+
+
+# splits a map into square tiles of tile_size km, every road is stored in the tile of each
+# of its endpoints, oriented away from it and tagged with the tile of the other endpoint
+# the whole map is parsed in memory here, only routing on the written tiles is bounded by the cache
+def build_tiles(map_path: str, tiles_path: str, tile_size=0.5):
+    names, xs, ys, ends1, ends2, speeds = read_map_arrays(map_path)
+    os.makedirs(tiles_path, exist_ok=True)
+
+    min_x = xs.min() if len(xs) else 0.0
+    min_y = ys.min() if len(ys) else 0.0
+    cols = int((xs.max() - min_x) // tile_size) + 1 if len(xs) else 1
+    rows = int((ys.max() - min_y) // tile_size) + 1 if len(ys) else 1
+    node_tiles = ((ys - min_y) // tile_size).astype(np.int64) * cols + \
+        ((xs - min_x) // tile_size).astype(np.int64)
+
+    lengths = np.sqrt((xs[ends1] - xs[ends2]) ** 2 + (ys[ends2] - ys[ends1]) ** 2)
+    heads = np.concatenate([ends1, ends2])
+    tails = np.concatenate([ends2, ends1])
+    lengths = np.concatenate([lengths, lengths])
+    speeds = np.concatenate([speeds, speeds])
+    entry_order = np.lexsort((heads, node_tiles[heads]))
+    heads = heads[entry_order]
+    tails = tails[entry_order]
+    speeds = speeds[entry_order]
+    weights = lengths[entry_order] / speeds
+    head_tiles = node_tiles[heads]
+    tail_tiles = node_tiles[tails]
+
+    border = np.zeros(len(xs), dtype=bool)
+    border[heads[head_tiles != tail_tiles]] = True
+
+    node_order = np.lexsort((np.arange(len(xs)), node_tiles))
+    sorted_node_tiles = node_tiles[node_order]
+    tile_ids = np.unique(node_tiles)
+    node_starts = np.searchsorted(sorted_node_tiles, tile_ids, side='left')
+    node_ends = np.searchsorted(sorted_node_tiles, tile_ids, side='right')
+    entry_starts = np.searchsorted(head_tiles, tile_ids, side='left')
+    entry_ends = np.searchsorted(head_tiles, tile_ids, side='right')
+    names = np.array(names, dtype=str)
+
+    for tile_id, node_start, node_end, entry_start, entry_end in zip(tile_ids.tolist(), node_starts, node_ends,
+                                                                     entry_starts, entry_ends):
+        ids = node_order[node_start:node_end]
+        tile_heads = heads[entry_start:entry_end]
+        offsets = np.append(np.searchsorted(tile_heads, ids), len(tile_heads))
+        np.savez(_tile_file(tiles_path, tile_id), ids=ids, names=names[ids], xs=xs[ids], ys=ys[ids],
+                 border=border[ids], offsets=offsets, neighbors=tails[entry_start:entry_end],
+                 neighbor_tiles=tail_tiles[entry_start:entry_end], weights=weights[entry_start:entry_end],
+                 speeds=speeds[entry_start:entry_end])
+
+    np.savez(os.path.join(tiles_path, META_FILE), min_x=min_x, min_y=min_y, tile_size=tile_size, cols=cols,
+             rows=rows, tile_ids=tile_ids, nodes_count=len(xs), roads_count=len(ends1))
+
+
+class Tile:
+    def __init__(self, tile_id: int, arrays: dict):
+        self.id = tile_id
+        self.ids = arrays['ids']
+        self.names = arrays['names']
+        self.xs = arrays['xs']
+        self.ys = arrays['ys']
+        self.border = arrays['border']
+        self.offsets = arrays['offsets']
+        self.neighbors = arrays['neighbors']
+        self.neighbor_tiles = arrays['neighbor_tiles']
+        self.weights = arrays['weights']
+        self.speeds = arrays['speeds']
+        self.nbytes = sum(array.nbytes for array in arrays.values())
+
+    def row(self, node_id: int):
+        return int(np.searchsorted(self.ids, node_id))
+
+    def roads(self, row: int):
+        start = self.offsets[row]
+        end = self.offsets[row + 1]
+        return zip(self.neighbors[start:end].tolist(), self.neighbor_tiles[start:end].tolist(),
+                   self.weights[start:end].tolist(), self.speeds[start:end].tolist())
+
+    def border_ids(self):
+        return self.ids[self.border]
+
+
+# least recently used tiles are dropped once the resident tiles exceed max_bytes,
+# the tile being requested is always kept even if it alone is larger than the ceiling
+class TileCache:
+    def __init__(self, tiles_path: str, max_bytes=DEFAULT_MAX_BYTES):
+        self.tiles_path = tiles_path
+        self.max_bytes = max_bytes
+        with np.load(os.path.join(tiles_path, META_FILE)) as meta:
+            self.min_x = float(meta['min_x'])
+            self.min_y = float(meta['min_y'])
+            self.tile_size = float(meta['tile_size'])
+            self.cols = int(meta['cols'])
+            self.rows = int(meta['rows'])
+            self.tile_ids = set(meta['tile_ids'].tolist())
+        self.tiles = OrderedDict()
+        self.bytes = 0
+        self.loaded = 0
+        self.hits = 0
+        self.evicted = 0
+
+    def reset_counters(self):
+        self.loaded = 0
+        self.hits = 0
+        self.evicted = 0
+
+    def counters(self):
+        return {'tiles_loaded': self.loaded, 'tile_hits': self.hits, 'tiles_evicted': self.evicted,
+                'tiles_resident': len(self.tiles), 'resident_bytes': self.bytes}
+
+    def get(self, tile_id: int):
+        tile = self.tiles.get(tile_id)
+        if tile is not None:
+            self.tiles.move_to_end(tile_id)
+            self.hits += 1
+            return tile
+
+        with np.load(_tile_file(self.tiles_path, tile_id)) as arrays:
+            tile = Tile(tile_id, {name: arrays[name] for name in arrays.files})
+        self.loaded += 1
+        self.tiles[tile_id] = tile
+        self.bytes += tile.nbytes
+        while self.bytes > self.max_bytes and len(self.tiles) > 1:
+            _, evicted_tile = self.tiles.popitem(last=False)
+            self.bytes -= evicted_tile.nbytes
+            self.evicted += 1
+        return tile
+
+    def tiles_near(self, x: float, y: float, r: float):
+        col_lo = max(self._tile(x - r - self.min_x, self.cols), 0)
+        col_hi = min(self._tile(x + r - self.min_x, self.cols), self.cols - 1)
+        row_lo = max(self._tile(y - r - self.min_y, self.rows), 0)
+        row_hi = min(self._tile(y + r - self.min_y, self.rows), self.rows - 1)
+        return [row * self.cols + col for row in range(row_lo, row_hi + 1) for col in range(col_lo, col_hi + 1)
+                if row * self.cols + col in self.tile_ids]
+
+    # same clamping as SpatialGrid._cell so that huge radii cannot overflow
+    def _tile(self, offset: float, count: int):
+        return math.floor(min(max(offset, -self.tile_size), count * self.tile_size) / self.tile_size)
+
+
+# routes queries on a tiled map, paging in only the tiles touched by snapping and by the
+# search frontier; durations match Navigator on the full graph
+class TiledNavigator:
+    def __init__(self, tiles_path: str, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache = TileCache(tiles_path, max_bytes)
+
+    def navigate(self, query, need_generate_map=False, saving_map_path=None, budget=None):
+        self.cache.reset_counters()
+        result = Navigator._run_within_budget(None, query, budget, lambda: self._route_query(query, budget))
+        stats = dict(result.stats) if result.stats is not None else {}
+        stats.update(self.cache.counters())
+        result.set_stats(stats)
+        if need_generate_map:
+            result.generate_map(saving_map_path, False)
+        return result
+
+    def _route_query(self, query, budget=None):
+        src_candidates = self._find_candidates(query.src_x, query.src_y, query.r)
+        dst_candidates = self._find_candidates(query.dst_x, query.dst_y, query.r)
+        if budget is not None:
+            budget.check()
+            budget.add_candidates(len(src_candidates) + len(dst_candidates))
+        reason = Result.missing_candidates_reason(src_candidates, dst_candidates)
+        if reason is not None:
+            return Result(None, query, [], 0, reason)
+
+        path, duration = self._search(src_candidates, dst_candidates, budget)
+        if not path:
+            return Result(None, query, [], None, Result.REASON_NO_PATH)
+
+        nodes = [Node('S', query.src_x, query.src_y, True)]
+        speeds = [WALK_SPEED]
+        for name, x, y, speed in path:
+            nodes.append(Node(name, x, y, False))
+            speeds.append(speed)
+        nodes.append(Node('E', query.dst_x, query.dst_y, True))
+        speeds.append(WALK_SPEED)
+        for i in range(len(nodes) - 1):
+            is_fake = i == 0 or i == len(nodes) - 2
+            road = Road(nodes[i], nodes[i + 1], speeds[i + 1] if not is_fake else WALK_SPEED, is_fake)
+            nodes[i].add_road(road)
+            nodes[i + 1].add_road(road)
+        return Result(None, query, nodes, duration, Result.REASON_SUCCESS)
+
+    # (node id, tile id, walking time) for every intersection within r, in node id order
+    def _find_candidates(self, x: float, y: float, r: float):
+        candidates = []
+        for tile_id in self.cache.tiles_near(x, y, r):
+            tile = self.cache.get(tile_id)
+            inside = np.sqrt((tile.xs - x) ** 2 + (y - tile.ys) ** 2) <= r
+            for row in np.flatnonzero(inside).tolist():
+                walk = euclidean_distance(x, y, float(tile.xs[row]), float(tile.ys[row])) / WALK_SPEED
+                candidates.append((int(tile.ids[row]), tile_id, walk))
+        return sorted(candidates)
+
+    def _search(self, src_candidates: list, dst_candidates: list, budget=None):
+        distance = {}
+        previous = {}
+        node_tiles = {}
+        heap = []
+        for node_id, tile_id, walk in src_candidates:
+            distance[node_id] = walk
+            node_tiles[node_id] = tile_id
+            heap.append((walk, node_id))
+        heapq.heapify(heap)
+        exits = {node_id: walk for node_id, _, walk in dst_candidates}
+
+        settled = {}
+        best = math.inf
+        best_exit = None
+        while heap:
+            current_distance, node_id = heapq.heappop(heap)
+            if current_distance > distance[node_id]:
+                continue
+            if current_distance >= best:
+                break
+            if budget is not None:
+                budget.settle()
+
+            tile = self.cache.get(node_tiles[node_id])
+            row = tile.row(node_id)
+            settled[node_id] = (str(tile.names[row]), float(tile.xs[row]), float(tile.ys[row]))
+            if node_id in exits and current_distance + exits[node_id] < best:
+                best = current_distance + exits[node_id]
+                best_exit = node_id
+
+            for neighbor, neighbor_tile, weight, speed in tile.roads(row):
+                alt_distance = current_distance + weight
+                if alt_distance < distance.get(neighbor, math.inf):
+                    distance[neighbor] = alt_distance
+                    previous[neighbor] = (node_id, speed)
+                    node_tiles[neighbor] = neighbor_tile
+                    heapq.heappush(heap, (alt_distance, neighbor))
+
+        if best_exit is None:
+            return [], None
+
+        path = []
+        node_id = best_exit
+        while node_id is not None:
+            previous_id, speed = previous.get(node_id, (None, WALK_SPEED))
+            path.append(settled[node_id] + (speed,))
+            node_id = previous_id
+        return list(reversed(path)), best
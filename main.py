@@ -1,11 +1,83 @@
+import argparse
 import os
-from Entities import Navigator, Query, Result
-
-
-def main():
-    run_gui()
-    # run_in_console()
-    # calculate_avg()
+from Entities import CandidatePruning, Graph, LiveNavigator, Navigator, Query, Result, SearchBudget
+
+DEFAULT_MAP_PATH = './input/Map200k.txt'
+DEFAULT_QUERY_PATH = './input/Query_200k_1000.txt'
+DEFAULT_OUTPUT_PATH = './output'
+DEFAULT_MAX_QUERY_SECONDS = 30
+
+
+def main(argv=None):
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'bench' and args.pruning == 'k-nearest' and (args.pruning_k is None or args.pruning_k < 1):
+        parser.error('--pruning k-nearest needs --pruning-k K with K >= 1')
+    if args.command is None or args.command == 'gui':
+        run_gui()
+    elif args.command == 'route':
+        run_route(args.map, args.src[0], args.src[1], args.dst[0], args.dst[1], args.r, args.image_dir,
+                  args.plot_all_nodes, args.max_query_seconds, args.alternatives)
+    elif args.command == 'batch':
+        run_in_console(args.map, args.queries, args.output, args.images, args.plot_all_nodes,
+                       args.max_query_seconds)
+    elif args.command == 'bench':
+        if args.orderings:
+            benchmark_ordering([(args.map, args.queries)], args.count)
+        else:
+            calculate_avg(args.map, args.queries, args.count, _pruning(args.pruning, args.pruning_k))
+    elif args.command == 'compile':
+        compile_tiles(args.map, args.tiles, args.tile_size)
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(description='Map navigator: route queries from the console or the GUI')
+    subparsers = parser.add_subparsers(dest='command')
+
+    subparsers.add_parser('gui', help='launch the Kivy application (default)')
+
+    route_parser = subparsers.add_parser('route', help='route a single query')
+    route_parser.add_argument('--map', default=DEFAULT_MAP_PATH)
+    route_parser.add_argument('--src', type=float, nargs=2, required=True, metavar=('X', 'Y'))
+    route_parser.add_argument('--dst', type=float, nargs=2, required=True, metavar=('X', 'Y'))
+    route_parser.add_argument('--r', type=float, required=True, help='walking radius in km')
+    route_parser.add_argument('--image-dir', help='save a map of the route into this directory')
+    route_parser.add_argument('--plot-all-nodes', action='store_true')
+    route_parser.add_argument('--max-query-seconds', type=float, default=DEFAULT_MAX_QUERY_SECONDS)
+    route_parser.add_argument('--alternatives', type=int, default=1, metavar='K',
+                              help='return up to K alternative routes')
+
+    batch_parser = subparsers.add_parser('batch', help='route every query of a query file')
+    batch_parser.add_argument('--map', default=DEFAULT_MAP_PATH)
+    batch_parser.add_argument('--queries', default=DEFAULT_QUERY_PATH)
+    batch_parser.add_argument('--output', default=DEFAULT_OUTPUT_PATH)
+    batch_parser.add_argument('--images', action='store_true', help='save a map of every route')
+    batch_parser.add_argument('--plot-all-nodes', action='store_true')
+    batch_parser.add_argument('--max-query-seconds', type=float, default=DEFAULT_MAX_QUERY_SECONDS)
+
+    bench_parser = subparsers.add_parser('bench', help='measure average search time')
+    bench_parser.add_argument('--map', default=DEFAULT_MAP_PATH)
+    bench_parser.add_argument('--queries', default=DEFAULT_QUERY_PATH)
+    bench_parser.add_argument('--count', type=int, default=100)
+    bench_parser.add_argument('--orderings', action='store_true', help='compare node orderings instead')
+    bench_parser.add_argument('--pruning', choices=('none', 'exact', 'k-nearest'), default='none',
+                              help='candidate pruning applied before the search')
+    bench_parser.add_argument('--pruning-k', type=int, help='candidates kept by k-nearest pruning')
+
+    compile_parser = subparsers.add_parser('compile', help='build the tiled layout of a map')
+    compile_parser.add_argument('--map', default=DEFAULT_MAP_PATH)
+    compile_parser.add_argument('--tiles', required=True, help='directory to write the tiles into')
+    compile_parser.add_argument('--tile-size', type=float, default=0.5, help='tile side in km')
+
+    return parser
+
+
+def _pruning(mode: str, k=None):
+    if mode == 'exact':
+        return CandidatePruning(CandidatePruning.MODE_EXACT)
+    if mode == 'k-nearest':
+        return CandidatePruning(CandidatePruning.MODE_K_NEAREST, k)
+    return None
 
 
 def run_gui():
@@ -15,19 +87,42 @@ def run_gui():
     navigator.run()
 
 
-def run_in_console():
-    map_path = './input/Map200k.txt'
-    query_path = './input/Query_200k_1000.txt'
-    output_path = './output'
-    need_generate_map = False
-    plot_all_nodes = True
+def run_route(map_path, src_x, src_y, dst_x, dst_y, r, image_dir=None, plot_all_nodes=False,
+              max_query_seconds=DEFAULT_MAX_QUERY_SECONDS, alternatives=1):
+    query = Query(1, src_x, src_y, dst_x, dst_y, r)
+    budget = SearchBudget(max_seconds=max_query_seconds) if max_query_seconds else None
+    if image_dir:
+        os.makedirs(image_dir, exist_ok=True)
+    if alternatives > 1:
+        results = LiveNavigator(map_path).alternatives(query, alternatives, budget=budget)
+        for i, result in enumerate(results):
+            print(f'Route {i + 1} of {len(results)}')
+            print(result)
+            if image_dir:
+                route_dir = os.path.join(image_dir, f'route_{i + 1}')
+                os.makedirs(route_dir, exist_ok=True)
+                result.generate_map(route_dir, plot_all_nodes)
+        return results
 
-    results = []
     navigator = Navigator(map_path)
+    result = navigator.navigate(query, image_dir is not None, image_dir, plot_all_nodes, budget)
+    print(result)
+    return result
+
+
+def run_in_console(map_path=DEFAULT_MAP_PATH, query_path=DEFAULT_QUERY_PATH, output_path=DEFAULT_OUTPUT_PATH,
+                   need_generate_map=False, plot_all_nodes=True, max_query_seconds=DEFAULT_MAX_QUERY_SECONDS):
+    budget = SearchBudget(max_seconds=max_query_seconds) if max_query_seconds else None
+    if need_generate_map:
+        os.makedirs(output_path, exist_ok=True)
+
+    results = []
+    navigator = LiveNavigator(map_path)
     queries = Query.read_queries(query_path)
+    navigator.snap_queries(queries)
 
     for i, query in enumerate(queries):
-        result = navigator.navigate(query)
+        result = navigator.navigate(query, budget=budget)
         if need_generate_map:
             result.generate_map(output_path, plot_all_nodes)
         results.append(result)
@@ -37,21 +132,21 @@ def run_in_console():
     return results
 
 
-def calculate_avg():
-    map_path = './input/Map200k.txt'
-    query_path = './input/Query_200k_1000.txt'
-    count = 100
-
-    navigator = Navigator(map_path)
+def calculate_avg(map_path=DEFAULT_MAP_PATH, query_path=DEFAULT_QUERY_PATH, count=100, pruning=None):
+    navigator = Navigator(map_path, pruning)
     queries = Query.read_queries(query_path)
+    navigator.snap_queries(queries)
 
     success_count = 0
     total_time = 0
+    dropped_count = 0
     for i, query in enumerate(queries):
         result = navigator.evaluate(query, True, False)
         if result.reason == Result.REASON_SUCCESS:
             total_time += result.exec_time
             success_count += 1
+            if result.dropped_candidates is not None:
+                dropped_count += sum(result.dropped_candidates)
             print(f'Query: {i}\tSuccess Count: {success_count}\tAverage: {total_time / success_count} s')
 
         if success_count == count:
@@ -59,8 +154,39 @@ def calculate_avg():
 
     avg = total_time / success_count
     print(f'Average execution time for {success_count} tries is: {avg} s')
+    if pruning is not None:
+        print(f'Average dropped candidates per query: {dropped_count / success_count}')
     return avg
 
 
+def benchmark_ordering(inputs=None, count=50):
+    if inputs is None:
+        inputs = [('./input/Map20k.txt', './input/Query_20k_1000.txt'),
+                  ('./input/Map200k.txt', './input/Query_200k_1000.txt')]
+    orderings = [('file', Graph.ORDER_FILE), ('hilbert', Graph.ORDER_HILBERT), ('bfs', Graph.ORDER_BFS)]
+
+    averages = {}
+    for map_path, query_path in inputs:
+        for name, ordering in orderings:
+            navigator = Navigator(map_path, ordering=ordering)
+            queries = Query.read_queries(query_path)[:count]
+            navigator.snap_queries(queries)
+
+            total_time = 0
+            for query in queries:
+                total_time += navigator.navigate(query).exec_time
+            averages[(map_path, name)] = total_time / len(queries)
+            print(f'{map_path}\t{name}\tAverage search time for {len(queries)} queries: '
+                  f'{averages[(map_path, name)]} s')
+
+    return averages
+
+
+def compile_tiles(map_path=DEFAULT_MAP_PATH, tiles_path=None, tile_size=0.5):
+    from Tiles import build_tiles
+    build_tiles(map_path, tiles_path, tile_size)
+    print(f'Tiles of {map_path} written to {tiles_path}')
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Entities import Graph, SpatialGrid
+
+MAP_PATH = os.path.join(ROOT, 'input', 'Map.txt')
+
+
+def test_huge_radius_returns_every_node():
+    graph = Graph(MAP_PATH)
+    grid = SpatialGrid(graph)
+    assert grid.query(1.0, 1.0, 1e308).tolist() == list(range(len(graph.nodes)))
+    assert grid.query_batch(np.array([-1e308]), np.array([1e308]), np.array([1e308]))[0].tolist() == []
+
+
+def test_query_matches_brute_force():
+    graph = Graph(MAP_PATH)
+    grid = SpatialGrid(graph)
+    for x, y, r in [(2.0, 2.0, 1.0), (0.0, 0.0, 0.5), (-5.0, 10.0, 3.0), (3.0, 1.0, 100.0)]:
+        expected = [node.index for node in graph.nodes if np.hypot(node.x - x, node.y - y) <= r]
+        assert grid.query(x, y, r).tolist() == expected
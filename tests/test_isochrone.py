@@ -0,0 +1,20 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Entities import Navigator
+
+MAP_PATH = os.path.join(ROOT, 'input', 'Map.txt')
+
+
+def test_raster_walks_no_further_than_r():
+    r = 0.3
+    isochrone = Navigator(MAP_PATH).isochrone(1.0, 2.4, r, 0.3)
+    grid, (min_x, min_y, cell_size) = isochrone.raster(0.05)
+    reach = [(isochrone.x, isochrone.y)] + [(node.x, node.y) for node in isochrone.arrivals]
+    assert min_x >= min(x for x, _ in reach) - r
+    assert min_y >= min(y for _, y in reach) - r
+    assert min_x + grid.shape[1] * cell_size <= max(x for x, _ in reach) + r + 2 * cell_size
+    assert min_y + grid.shape[0] * cell_size <= max(y for _, y in reach) + r + 2 * cell_size
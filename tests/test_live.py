@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Entities import WALK_SPEED, LiveNavigator, Query, euclidean_distance
+
+MAP_PATH = os.path.join(ROOT, 'input', 'Map.txt')
+QUERY_PATH = os.path.join(ROOT, 'input', 'Query.txt')
+UPDATES = [('1', '2', 1.0), ('2', '5', 1.0)]
+
+
+@pytest.fixture
+def updated():
+    navigator = LiveNavigator(MAP_PATH)
+    query = Query.read_queries(QUERY_PATH)[0]
+    before = navigator.navigate(query).duration
+    navigator.update_speeds(UPDATES)
+    after = navigator.navigate(query).duration
+    assert after != pytest.approx(before)
+    return navigator, query, after
+
+
+def test_matrix_sees_speed_updates(updated):
+    navigator, query, after = updated
+    origins = [(query.src_x, query.src_y)]
+    destinations = [(query.dst_x, query.dst_y)]
+    assert navigator.matrix(origins, destinations, query.r).durations[0, 0] == pytest.approx(after)
+    assert navigator.matrix(origins, destinations, query.r, workers=2).durations[0, 0] == pytest.approx(after)
+
+
+def test_isochrone_sees_speed_updates(updated):
+    navigator, query, after = updated
+    last = navigator.navigate(query).nodes[-2]
+    walk = euclidean_distance(last.x, last.y, query.dst_x, query.dst_y) / WALK_SPEED
+    for isochrone in (navigator.isochrone(query.src_x, query.src_y, query.r, after),
+                      navigator.isochrones([(query.src_x, query.src_y)], query.r, after, workers=2)[0]):
+        arrivals = {node.name: arrival for node, arrival in isochrone.arrivals.items()}
+        assert arrivals[last.name] + walk == pytest.approx(after)
+
+
+def test_evaluate_sees_speed_updates_without_touching_the_resident_graph(updated):
+    navigator, query, after = updated
+    nodes_count = len(navigator.graph.nodes)
+    assert navigator.evaluate(query, True, True).duration == pytest.approx(after)
+    assert len(navigator.graph.nodes) == nodes_count
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Entities import WALK_SPEED, Navigator, Query, Result, euclidean_distance
+
+MAP_PATH = os.path.join(ROOT, 'input', 'Map.txt')
+QUERY_PATH = os.path.join(ROOT, 'input', 'Query.txt')
+
+
+def test_paths_add_up_to_the_matrix_durations():
+    queries = Query.read_queries(QUERY_PATH)
+    points = [(query.src_x, query.src_y) for query in queries] + [(query.dst_x, query.dst_y) for query in queries]
+    r = max(query.r for query in queries)
+    matrix = Navigator(MAP_PATH).matrix(points, points, r, return_predecessors=True)
+
+    for i, (src_x, src_y) in enumerate(points):
+        nodes, previous = matrix.predecessors[i] if matrix.predecessors[i] is not None else ([], [])
+        assert len(nodes) <= len(matrix.graph.nodes)
+        for j, (dst_x, dst_y) in enumerate(points):
+            path = matrix.path(i, j)
+            if not path:
+                assert matrix.durations[i, j] == float('inf')
+                continue
+            duration = euclidean_distance(src_x, src_y, path[0].x, path[0].y) / WALK_SPEED
+            duration += sum(Result._road_between(node, next_node).weight for node, next_node in zip(path, path[1:]))
+            duration += euclidean_distance(dst_x, dst_y, path[-1].x, path[-1].y) / WALK_SPEED
+            assert duration == pytest.approx(matrix.durations[i, j])
+
+
+def test_matrix_matches_navigate():
+    navigator = Navigator(MAP_PATH)
+    for query in Query.read_queries(QUERY_PATH):
+        matrix = navigator.matrix([(query.src_x, query.src_y)], [(query.dst_x, query.dst_y)], query.r)
+        result = navigator.navigate(query)
+        if result.reason == Result.REASON_SUCCESS:
+            assert matrix.durations[0, 0] == pytest.approx(result.duration)
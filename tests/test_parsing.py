@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Entities import InputFormatError, Query, read_map_arrays
+
+
+def _write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_map_rows_with_compensating_field_counts_are_rejected(tmp_path):
+    path = _write(tmp_path, 'map.txt', '2\n0 1.0 2.0 9\n1 3.0\n1\n0 1 30\n')
+    with pytest.raises(InputFormatError) as error:
+        read_map_arrays(path)
+    assert error.value.line == 2
+
+
+def test_query_rows_with_compensating_field_counts_are_rejected(tmp_path):
+    path = _write(tmp_path, 'queries.txt', '2\n1 1 2 2 0.5 7\n3 3 4 5\n')
+    with pytest.raises(InputFormatError) as error:
+        Query.read_queries(path)
+    assert error.value.line == 2
+
+
+def test_well_formed_files_load(tmp_path):
+    names, xs, ys, ends1, ends2, speeds = read_map_arrays(
+        _write(tmp_path, 'map.txt', '2\n0 1.0 2.0\n1 3.0 4.0\n1\n0 1 30\n'))
+    assert list(names) == ['0', '1'] and xs.tolist() == [1.0, 3.0] and speeds.tolist() == [30.0]
+    queries = Query.read_queries(_write(tmp_path, 'queries.txt', '1\n1 1 2 2 0.5\n'))
+    assert [(query.id, query.r) for query in queries] == [(1, 0.5)]